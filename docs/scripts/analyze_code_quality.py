@@ -10,15 +10,121 @@ Deeper analysis of poorly-documented files to identify:
 """
 
 import os
+import pickle
 import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import datetime
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Files handed to a worker process at a time, and the number of threads each
+# worker uses to read files of its batch ahead of the one being parsed
+BATCH_SIZE = 64
+READ_AHEAD = 8
+
+# Per-file results are cached between runs, keyed by path, mtime and size.
+# Bump CACHE_VERSION whenever analyze_content changes what it reports.
+CACHE_FILE = '.analyze_cache.db'
+CACHE_VERSION = 4
+CACHE_COMMIT_EVERY = 1000
+
+# Example files kept per issue kind in the results
+MAX_EXAMPLES = 5
+
+# Comments and string/character literals, in a single left-to-right pass.
+# Literals are matched so that comment markers inside them are not mistaken
+# for comments; an unterminated block comment runs to the end of the file.
+# A quote right after a digit is a C++14 digit separator (1'000), not the
+# start of a character literal.
+_COMMENT_OR_LITERAL_RE = re.compile(
+    r'//[^\n]*|/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\\n])*"|(?<!\d)\'(?:\\.|[^\'\\\n])*\'',
+    re.DOTALL
+)
+
+def _strip_cpp_comments(content):
+    """Return content with // and /* */ comments removed.
+
+    Newlines inside block comments are kept so the line structure of the
+    stripped text matches the original. Raw string literals (R"(...)") are
+    not recognised, so quotes or comment markers inside them can throw the
+    scan off.
+    """
+    parts = []
+    pos = 0
+    for match in _COMMENT_OR_LITERAL_RE.finditer(content):
+        token = match.group()
+        if token[0] != '/':
+            continue
+        start = match.start()
+        parts.append(content[pos:start])
+        if token[1] == '*':
+            parts.append('\n' * token.count('\n'))
+        pos = match.end()
+    parts.append(content[pos:])
+    return ''.join(parts)
+
+def open_cache(cache_file):
+    """Open the result cache, discarding entries written by another version."""
+    conn = sqlite3.connect(cache_file)
+    if conn.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+        conn.execute('DROP TABLE IF EXISTS results')
+        conn.execute(f'PRAGMA user_version = {CACHE_VERSION}')
+    conn.execute('CREATE TABLE IF NOT EXISTS results '
+                 '(path TEXT PRIMARY KEY, mtime INT, size INT, result BLOB)')
+    return conn
+
+def cache_key(filepath):
+    """Return the (path, mtime, size) cache key of filepath; raises OSError."""
+    st = os.stat(filepath)
+    return (str(filepath), st.st_mtime_ns, st.st_size)
+
+def load_cached(cache, key):
+    """Return the cached result for key, or None if there is none."""
+    row = cache.execute('SELECT result FROM results '
+                        'WHERE path = ? AND mtime = ? AND size = ?', key).fetchone()
+    return pickle.loads(row[0]) if row else None
+
+def store_cached(cache, key, result):
+    """Store result under key; the caller commits."""
+    cache.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                  (*key, pickle.dumps(result)))
+
+def read_source(filepath):
+    """Read a source file as text; raises OSError if it cannot be read.
+
+    The file is read in one binary call and decoded once, which is cheaper
+    than text mode's chunked decoding; newlines are normalized to '\\n' as
+    text mode would. Both analyzers read through this function, so cached
+    results do not depend on which one produced them.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    content = data.decode('utf-8', errors='ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+def _read_source(filepath):
+    """Read a source file, returning None if it cannot be read."""
+    try:
+        return read_source(filepath)
+    except Exception as e:
+        return None
+
 class CodeQualityAnalyzer:
     def __init__(self, root_dir):
         self.root_dir = Path(root_dir)
+        # String form used to relativize paths without building Path objects
+        self.root_prefix = str(self.root_dir) + os.sep
         self.stats = {
             'magic_numbers': {
                 'files_with_magic_numbers': 0,
@@ -47,13 +153,16 @@ class CodeQualityAnalyzer:
             'examples': defaultdict(list)
         }
 
-        # Magic number pattern (numeric literals that aren't 0, 1, -1, 2, or simple powers)
+        # Magic number pattern (numeric literals that aren't 0, 1, -1, 2, or simple powers).
+        # It starts with a plain digit so the regex engine can skip ahead to
+        # candidate positions; the "not preceded by" check is done after it.
         self.magic_number_pattern = re.compile(
-            r'(?<![a-zA-Z0-9_])'  # Not preceded by alphanumeric
+            r'\d'
+            r'(?<![a-zA-Z0-9_].)'  # Not preceded by alphanumeric
             r'(?:'
-            r'(?:0x[0-9a-fA-F]+)|'  # Hex literals
-            r'(?:\d{3,}(?:\.\d+)?)|'  # Numbers with 3+ digits
-            r'(?:\d+\.\d{3,})'  # Decimals with 3+ decimal places
+            r'(?:(?<=0)x[0-9a-fA-F]+)|'  # Hex literals
+            r'(?:\d{2,}(?:\.\d+)?)|'  # Numbers with 3+ digits
+            r'(?:\d*\.\d{3,})'  # Decimals with 3+ decimal places
             r')'
             r'(?![a-zA-Z0-9_e])'  # Not followed by alphanumeric or 'e' (for scientific notation)
         )
@@ -61,52 +170,55 @@ class CodeQualityAnalyzer:
         # Year patterns in comments
         self.year_pattern = re.compile(r'(?:19|20)\d{2}')
 
-        # Code smell patterns
-        self.todo_pattern = re.compile(r'//.*?TODO|/\*.*?TODO.*?\*/', re.IGNORECASE)
-        self.fixme_pattern = re.compile(r'//.*?FIXME|/\*.*?FIXME.*?\*/', re.IGNORECASE)
-        self.hack_pattern = re.compile(r'//.*?HACK|/\*.*?HACK.*?\*/', re.IGNORECASE)
-        self.deprecated_pattern = re.compile(r'deprecated|obsolete', re.IGNORECASE)
+        # Opening and closing braces, for the nesting and function length scan
+        self.brace_pattern = re.compile(r'[{}]')
+
+        # Header text ending a namespace, extern "C" or class/struct/union
+        # opening brace; groups inside such scopes are measured instead
+        self.scope_pattern = re.compile(
+            r'(?:\b(?:namespace|class|struct|union)\b[^;(){}=]*|\bextern\s*"C"\s*)$'
+        )
 
     def analyze_file(self, filepath):
         """Analyze a single file for code quality indicators."""
-        try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except Exception as e:
+        content = _read_source(filepath)
+        if content is None:
             return None
+        return self.analyze_content(filepath, content)
+
+    def analyze_content(self, filepath, content):
+        """Analyze the already read content of filepath.
 
+        Does not touch self.stats, so it can run in a worker process; the
+        returned partial stats are folded in with record_result().
+        """
         result = {
             'file': str(filepath),
-            'issues': []
+            'issues': [],
+            'magic_numbers': 0,
+            'magic_samples': [],
+            'complexity': None,
+            'age': None,
+            'code_smells': Counter(),
+            'max_nesting': 0
         }
 
+        # Lowercased copy for cheap literal prescreens before running regexes
+        lower = content.lower()
+
         # Count magic numbers (exclude common constants and in comments)
         lines = content.split('\n')
-        code_only = []
-        for line in lines:
-            # Remove comments
-            line_code = re.sub(r'//.*$', '', line)
-            line_code = re.sub(r'/\*.*?\*/', '', line_code)
-            code_only.append(line_code)
-
-        code_text = '\n'.join(code_only)
+        code_text = _strip_cpp_comments(content)
         magic_numbers = self.magic_number_pattern.findall(code_text)
 
         # Filter out common patterns
         filtered_magic = [m for m in magic_numbers if m not in ['100', '1000', '0x00', '0xff']]
 
         if len(filtered_magic) >= 5:  # File has significant magic numbers
-            self.stats['magic_numbers']['files_with_magic_numbers'] += 1
-            self.stats['magic_numbers']['total_magic_numbers'] += len(filtered_magic)
+            result['magic_numbers'] = len(filtered_magic)
+            result['magic_samples'] = filtered_magic[:5]
             result['issues'].append(f"Contains {len(filtered_magic)} magic numbers")
 
-            if len(self.stats['examples']['magic_numbers']) < 5:
-                self.stats['examples']['magic_numbers'].append({
-                    'file': str(filepath.relative_to(self.root_dir)),
-                    'count': len(filtered_magic),
-                    'samples': filtered_magic[:5]
-                })
-
         # Measure complexity (simple heuristic based on control structures)
         control_keywords = len(re.findall(r'\b(if|for|while|switch|case)\b', content))
         lines_of_code = len([l for l in lines if l.strip() and not l.strip().startswith('//')])
@@ -114,92 +226,151 @@ class CodeQualityAnalyzer:
         complexity = control_keywords / max(lines_of_code / 100, 1)
 
         if complexity > 15:
-            self.stats['complexity']['very_complex'] += 1
+            result['complexity'] = 'very_complex'
             result['issues'].append("Very complex (high cyclomatic complexity)")
         elif complexity > 10:
-            self.stats['complexity']['complex'] += 1
+            result['complexity'] = 'complex'
             result['issues'].append("Complex code")
         elif complexity > 5:
-            self.stats['complexity']['moderate'] += 1
+            result['complexity'] = 'moderate'
         else:
-            self.stats['complexity']['simple'] += 1
+            result['complexity'] = 'simple'
 
         # Check for age indicators in comments
-        years = self.year_pattern.findall(content)
+        years = []
+        if '19' in content or '20' in content:
+            years = self.year_pattern.findall(content)
         if years:
             years_int = [int(y) for y in years]
             oldest_year = min(years_int)
             newest_year = max(years_int)
 
             if oldest_year < 2010:
-                self.stats['age_indicators']['very_old'] += 1
+                result['age'] = 'very_old'
                 result['issues'].append(f"Contains references to {oldest_year} (likely old code)")
             elif oldest_year < 2016:
-                self.stats['age_indicators']['old'] += 1
+                result['age'] = 'old'
                 result['issues'].append(f"References year {oldest_year}")
             elif oldest_year < 2021:
-                self.stats['age_indicators']['recent'] += 1
+                result['age'] = 'recent'
             else:
-                self.stats['age_indicators']['modern'] += 1
-
-        # Check for code smells
-        todos = len(self.todo_pattern.findall(content))
+                result['age'] = 'modern'
+
+        # Check for code smells: each comment counts once per marker kind it
+        # contains. Deprecated/obsolete markers are plain substrings of the
+        # lowercased content.
+        smells = Counter()
+        if 'todo' in lower or 'fixme' in lower or 'hack' in lower:
+            for match in _COMMENT_OR_LITERAL_RE.finditer(content):
+                token = match.group()
+                if token[0] != '/':
+                    continue
+                token = token.lower()
+                for marker in ('todo', 'fixme', 'hack'):
+                    if marker in token:
+                        smells[marker] += 1
+
+        todos = smells['todo']
         if todos > 0:
-            self.stats['code_smells']['todo_comments'] += todos
+            result['code_smells']['todo_comments'] = todos
             result['issues'].append(f"Contains {todos} TODO comment(s)")
 
-        fixmes = len(self.fixme_pattern.findall(content))
+        fixmes = smells['fixme']
         if fixmes > 0:
-            self.stats['code_smells']['fixme_comments'] += fixmes
+            result['code_smells']['fixme_comments'] = fixmes
             result['issues'].append(f"Contains {fixmes} FIXME comment(s)")
 
-        hacks = len(self.hack_pattern.findall(content))
+        hacks = smells['hack']
         if hacks > 0:
-            self.stats['code_smells']['hack_comments'] += hacks
+            result['code_smells']['hack_comments'] = hacks
             result['issues'].append(f"Contains {hacks} HACK comment(s)")
 
-        deprecated = len(self.deprecated_pattern.findall(content))
-        if deprecated > 0:
-            self.stats['code_smells']['deprecated'] += 1
+        if 'deprecated' in lower or 'obsolete' in lower:
+            result['code_smells']['deprecated'] = 1
             result['issues'].append("Contains deprecated/obsolete markers")
 
-            if len(self.stats['examples']['deprecated']) < 5:
-                self.stats['examples']['deprecated'].append({
-                    'file': str(filepath.relative_to(self.root_dir))
-                })
-
-        # Check for long functions (more than 100 lines)
-        function_pattern = re.compile(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', re.DOTALL)
-        functions = function_pattern.findall(content)
-        long_funcs = [f for f in functions if f.count('\n') > 100]
-        if long_funcs:
-            self.stats['code_smells']['long_functions'] += len(long_funcs)
-            result['issues'].append(f"Contains {len(long_funcs)} very long function(s) (>100 lines)")
-
-        # Check for deep nesting
+        # Scan braces once for both long functions (outermost brace groups
+        # spanning more than 100 lines, not counting namespace, extern "C"
+        # and class scopes) and the deepest nesting level. Unbalanced closing
+        # braces, e.g. from strings or comments, do not push the depth below 0.
+        long_funcs = 0
         max_nesting = 0
         current_nesting = 0
-        for char in content:
-            if char == '{':
+        group_depth = 0  # depth of the group being measured, 0 if none
+        start = 0
+        header_start = 0
+        for match in self.brace_pattern.finditer(content):
+            pos = match.start()
+            if match.group() == '{':
                 current_nesting += 1
                 max_nesting = max(max_nesting, current_nesting)
-            elif char == '}':
+                if not group_depth and not self.scope_pattern.search(content, header_start, pos):
+                    group_depth = current_nesting
+                    start = pos
+            elif current_nesting:
+                if current_nesting == group_depth:
+                    group_depth = 0
+                    if content.count('\n', start, pos) > 100:
+                        long_funcs += 1
                 current_nesting -= 1
+            header_start = match.end()
+
+        if long_funcs:
+            result['code_smells']['long_functions'] = long_funcs
+            result['issues'].append(f"Contains {long_funcs} very long function(s) (>100 lines)")
 
+        # Check for deep nesting
         if max_nesting > 6:
-            self.stats['code_smells']['deep_nesting'] += 1
+            result['code_smells']['deep_nesting'] = 1
+            result['max_nesting'] = max_nesting
             result['issues'].append(f"Deep nesting detected (max depth: {max_nesting})")
 
-            if len(self.stats['examples']['deep_nesting']) < 5:
-                self.stats['examples']['deep_nesting'].append({
-                    'file': str(filepath.relative_to(self.root_dir)),
-                    'depth': max_nesting
+        return result
+
+    def record_result(self, result):
+        """Fold the partial stats returned by analyze_file into self.stats."""
+        rel_path = result['file']
+        if rel_path.startswith(self.root_prefix):
+            rel_path = rel_path[len(self.root_prefix):]
+        examples = self.stats['examples']
+
+        if result['magic_numbers']:
+            self.stats['magic_numbers']['files_with_magic_numbers'] += 1
+            self.stats['magic_numbers']['total_magic_numbers'] += result['magic_numbers']
+
+            if len(examples['magic_numbers']) < MAX_EXAMPLES:
+                examples['magic_numbers'].append({
+                    'file': rel_path,
+                    'count': result['magic_numbers'],
+                    'samples': result['magic_samples']
                 })
 
-        return result
+        self.stats['complexity'][result['complexity']] += 1
+        if result['age']:
+            self.stats['age_indicators'][result['age']] += 1
 
-    def analyze_from_json(self, json_file):
-        """Analyze files categorized as poorly documented."""
+        for smell, count in result['code_smells'].items():
+            self.stats['code_smells'][smell] += count
+
+        if result['code_smells']['deprecated'] and len(examples['deprecated']) < MAX_EXAMPLES:
+            examples['deprecated'].append({
+                'file': rel_path
+            })
+
+        if result['code_smells']['deep_nesting'] and len(examples['deep_nesting']) < MAX_EXAMPLES:
+            examples['deep_nesting'].append({
+                'file': rel_path,
+                'depth': result['max_nesting']
+            })
+
+    def analyze_from_json(self, json_file, max_workers=None, cache_file=CACHE_FILE):
+        """Analyze files categorized as poorly documented.
+
+        Files are analyzed in parallel across max_workers processes (default:
+        one per CPU) in batches of BATCH_SIZE, and the results are recorded
+        in input order. Results of files unchanged since they were stored in
+        cache_file are reused; pass cache_file=None to disable the cache.
+        """
         with open(json_file, 'r') as f:
             data = json.load(f)
 
@@ -208,13 +379,50 @@ class CodeQualityAnalyzer:
         print(f"Analyzing {len(poorly_doc_files)} poorly documented files...")
         print()
 
-        for i, file_info in enumerate(poorly_doc_files):
-            if i % 1000 == 0:
-                print(f"  Progress: {i}/{len(poorly_doc_files)}")
-
-            filepath = Path(file_info['file'])
-            if filepath.exists():
-                self.analyze_file(filepath)
+        # Missing files are skipped by the workers, whose open() fails anyway
+        filepaths = [file_info['file'] for file_info in poorly_doc_files]
+
+        # Look up unchanged files in the cache, only the rest is analyzed
+        cache = open_cache(cache_file) if cache_file else None
+        entries = []
+        for filepath in filepaths:
+            key = None
+            cached = None
+            if cache:
+                try:
+                    key = cache_key(filepath)
+                except OSError:
+                    continue
+                cached = load_cached(cache, key)
+            entries.append((filepath, key, cached))
+
+        misses = [filepath for filepath, key, cached in entries if cached is None]
+        batches = [misses[i:i + BATCH_SIZE] for i in range(0, len(misses), BATCH_SIZE)]
+        stored = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.root_dir,)) as executor:
+            fresh = chain.from_iterable(executor.map(_analyze_batch, batches))
+            for i, (filepath, key, cached) in enumerate(entries):
+                if i % 1000 == 0:
+                    print(f"  Progress: {i}/{len(entries)}")
+
+                result = cached if cached is not None else next(fresh)
+                if not result:
+                    continue
+
+                if cache and cached is None:
+                    store_cached(cache, key, result)
+                    stored += 1
+                    if stored % CACHE_COMMIT_EVERY == 0:
+                        cache.commit()
+
+                self.record_result(result)
+
+        if cache:
+            cache.commit()
+            cache.close()
 
     def generate_report(self):
         """Generate detailed quality report."""
@@ -277,6 +485,25 @@ class CodeQualityAnalyzer:
 
         print("=" * 80)
 
+# Analyzer and reader threads owned by each worker process of analyze_from_json
+_worker_analyzer = None
+_worker_reader = None
+
+def _init_worker(root_dir):
+    global _worker_analyzer, _worker_reader
+    _worker_analyzer = CodeQualityAnalyzer(root_dir)
+    _worker_reader = ThreadPoolExecutor(max_workers=READ_AHEAD)
+
+def _analyze_batch(filepaths):
+    """Analyze a batch of files, reading ahead while earlier ones are parsed."""
+    results = []
+    for filepath, content in zip(filepaths, _worker_reader.map(_read_source, filepaths)):
+        if content is None:
+            results.append(None)
+        else:
+            results.append(_worker_analyzer.analyze_content(filepath, content))
+    return results
+
 if __name__ == '__main__':
     analyzer = CodeQualityAnalyzer('/home/user/geant4')
 
@@ -286,7 +513,11 @@ if __name__ == '__main__':
     analyzer.analyze_from_json('doc_analysis_results.json')
     analyzer.generate_report()
 
-    with open('code_quality_results.json', 'w') as f:
-        json.dump(analyzer.stats, f, indent=2, default=str)
+    if orjson:
+        with open('code_quality_results.json', 'wb') as f:
+            f.write(orjson.dumps(analyzer.stats, default=str, option=orjson.OPT_INDENT_2))
+    else:
+        with open('code_quality_results.json', 'w') as f:
+            json.dump(analyzer.stats, f, indent=2, default=str)
 
     print("Detailed results saved to: code_quality_results.json")
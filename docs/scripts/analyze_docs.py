@@ -11,13 +11,51 @@ It categorizes files into:
 
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
 import json
 
+from analyze_code_quality import (BATCH_SIZE, CACHE_COMMIT_EVERY, CACHE_FILE, READ_AHEAD,
+                                  CodeQualityAnalyzer, cache_key, open_cache, read_source,
+                                  store_cached)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# C++ source extensions to analyze, and directories never descended into
+SOURCE_EXTS = ('.hh', '.cc', '.h', '.hpp', '.cpp')
+PRUNE_DIRS = {'externals', 'examples'}
+
+def _read_source(filepath):
+    """Read a source file with read_source, reporting it if it cannot be read."""
+    try:
+        return read_source(filepath)
+    except Exception as e:
+        print(f"Error reading {filepath}: {e}")
+        return None
+
+def _match_lines(content, matches):
+    """Yield the line number of each of the in-order matches in content.
+
+    Newlines are counted incrementally from one match to the next, so the
+    content is scanned once however many matches there are.
+    """
+    pos = line_num = 0
+    for match in matches:
+        line_num += content.count('\n', pos, match.start())
+        pos = match.start()
+        yield line_num
+
 class DocAnalyzer:
     def __init__(self, root_dir):
         self.root_dir = Path(root_dir)
+        # String forms used to relativize paths without building Path objects
+        self.root_str = str(self.root_dir)
+        self.root_prefix = self.root_str + os.sep
         self.stats = {
             'total_files': 0,
             'total_classes': 0,
@@ -56,21 +94,21 @@ class DocAnalyzer:
         )
         # C++ style doc comments
         self.doc_line_pattern = re.compile(r'^\s*///.*$', re.MULTILINE)
-        # Brief description pattern
-        self.brief_pattern = re.compile(r'\\brief|@brief|///<')
-        # Detailed patterns for quality assessment
-        self.param_pattern = re.compile(r'\\param|@param')
-        self.return_pattern = re.compile(r'\\return|@return')
+        # Start of either kind of documentation
+        self.doc_start_pattern = re.compile(r'/\*\*|///')
+        # Quality markers: brief descriptions (\brief, @brief or ///<),
+        # parameters and return values. ///< yields an empty group.
+        self.doc_marker_pattern = re.compile(r'[\\@](brief|param|return)|///<')
 
     def analyze_file(self, filepath):
         """Analyze a single C++ file for documentation quality."""
-        try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
+        content = _read_source(filepath)
+        if content is None:
             return None
+        return self.analyze_content(filepath, content)
 
+    def analyze_content(self, filepath, content):
+        """Analyze the already read content of filepath."""
         # Count classes and functions
         classes = self.class_pattern.findall(content)
         functions = self.function_pattern.findall(content)
@@ -82,31 +120,24 @@ class DocAnalyzer:
         doc_blocks = self.doc_block_pattern.findall(content)
         doc_lines = self.doc_line_pattern.findall(content)
 
-        # Combine all documentation
-        all_docs = '\n'.join(doc_blocks + doc_lines)
-
         # Count documented items (heuristic: doc block within 5 lines before class/function)
-        lines = content.split('\n')
+        num_lines = content.count('\n') + 1
         documented_classes = 0
         documented_functions = 0
 
-        # Find positions of documentation
-        doc_positions = set()
-        for i, line in enumerate(lines):
-            if '/**' in line or '///' in line:
-                # Mark next few lines as having documentation
-                for j in range(i, min(i + 10, len(lines))):
-                    doc_positions.add(j)
+        # Find positions of documentation, one byte per line
+        doc_positions = bytearray(num_lines)
+        for i in _match_lines(content, self.doc_start_pattern.finditer(content)):
+            # Mark next few lines as having documentation
+            doc_positions[i:i + 10] = b'\x01' * min(10, num_lines - i)
 
         # Check which classes/functions have documentation
-        for match in self.class_pattern.finditer(content):
-            line_num = content[:match.start()].count('\n')
-            if line_num in doc_positions or (line_num - 1) in doc_positions or (line_num - 2) in doc_positions:
+        for line_num in _match_lines(content, self.class_pattern.finditer(content)):
+            if 1 in doc_positions[max(line_num - 2, 0):line_num + 1]:
                 documented_classes += 1
 
-        for match in self.function_pattern.finditer(content):
-            line_num = content[:match.start()].count('\n')
-            if line_num in doc_positions or (line_num - 1) in doc_positions or (line_num - 2) in doc_positions:
+        for line_num in _match_lines(content, self.function_pattern.finditer(content)):
+            if 1 in doc_positions[max(line_num - 2, 0):line_num + 1]:
                 documented_functions += 1
 
         # Calculate documentation quality metrics
@@ -114,11 +145,16 @@ class DocAnalyzer:
         documented_items = documented_classes + documented_functions
 
         # Count quality indicators
-        brief_count = len(self.brief_pattern.findall(all_docs))
-        param_count = len(self.param_pattern.findall(all_docs))
-        return_count = len(self.return_pattern.findall(all_docs))
-
-        doc_chars = len(all_docs)
+        markers = Counter()
+        for doc in chain(doc_blocks, doc_lines):
+            markers.update(self.doc_marker_pattern.findall(doc))
+        brief_count = markers['brief'] + markers['']
+        param_count = markers['param']
+        return_count = markers['return']
+
+        # Size of all documentation, as if joined by newlines
+        doc_items = len(doc_blocks) + len(doc_lines)
+        doc_chars = sum(map(len, doc_blocks)) + sum(map(len, doc_lines)) + max(doc_items - 1, 0)
         code_chars = len(content)
 
         # Calculate documentation ratio
@@ -172,18 +208,45 @@ class DocAnalyzer:
             'file_size': code_chars
         }
 
-    def analyze_directory(self, directory, module_name='root'):
-        """Recursively analyze all C++ files in a directory."""
-        dir_path = self.root_dir / directory if directory else self.root_dir
+    def analyze_directory(self, directory, module_name='root', max_workers=None,
+                          quality_cache=None):
+        """Recursively analyze all C++ files in a directory.
+
+        Files are analyzed in parallel across max_workers processes (default:
+        one per CPU) in batches of BATCH_SIZE, and the results are recorded
+        in discovery order.
+
+        If quality_cache names the result cache of analyze_code_quality.py,
+        poorly documented files are also analyzed for code quality while
+        their content is at hand, and the results are stored there so the
+        quality pass does not read them again.
+        """
+        dir_path = os.path.join(self.root_str, directory) if directory else self.root_str
+
+        # Find all .hh and .cc files in a single walk
+        filepaths = []
+        for root, dirs, files in os.walk(dir_path):
+            # Skip external dependencies and examples
+            dirs[:] = [d for d in dirs if d not in PRUNE_DIRS]
+            for name in files:
+                if name.endswith(SOURCE_EXTS):
+                    filepaths.append(os.path.join(root, name))
+
+        cache = open_cache(quality_cache) if quality_cache else None
+        stored = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.root_dir, cache is not None)) as executor:
+            batches = [filepaths[i:i + BATCH_SIZE] for i in range(0, len(filepaths), BATCH_SIZE)]
+            results = chain.from_iterable(executor.map(_analyze_batch, batches))
+            for filepath, (result, quality) in zip(filepaths, results):
+                if quality:
+                    store_cached(cache, *quality)
+                    stored += 1
+                    if stored % CACHE_COMMIT_EVERY == 0:
+                        cache.commit()
 
-        # Find all .hh and .cc files
-        for ext in ['.hh', '.cc', '.h', '.hpp', '.cpp']:
-            for filepath in dir_path.rglob(f'*{ext}'):
-                # Skip external dependencies and examples
-                if 'externals' in filepath.parts or 'examples' in filepath.parts:
-                    continue
-
-                result = self.analyze_file(filepath)
                 if result:
                     self.stats['total_files'] += 1
                     self.stats['total_classes'] += result['classes']
@@ -194,13 +257,13 @@ class DocAnalyzer:
                     category = result['category']
                     self.stats['files_by_category'][category].append(result)
 
-                    # Module stats
-                    if 'source' in filepath.parts:
-                        idx = filepath.parts.index('source')
-                        if len(filepath.parts) > idx + 1:
-                            mod = filepath.parts[idx + 1]
-                        else:
-                            mod = 'other'
+                    # Module stats, from the first directory under source/
+                    rel_path = filepath
+                    if rel_path.startswith(self.root_prefix):
+                        rel_path = rel_path[len(self.root_prefix):]
+                    parts = rel_path.split(os.sep, 2)
+                    if len(parts) > 1 and parts[0] == 'source':
+                        mod = parts[1]
                     else:
                         mod = 'other'
 
@@ -218,6 +281,10 @@ class DocAnalyzer:
                     else:
                         ms['poor_doc'] += 1
 
+        if cache:
+            cache.commit()
+            cache.close()
+
     def generate_report(self):
         """Generate a comprehensive documentation report."""
         total = self.stats['total_files']
@@ -285,17 +352,62 @@ class DocAnalyzer:
             }
         }
 
+# Analyzers and reader threads owned by each worker process of analyze_directory
+_worker_analyzer = None
+_worker_quality = None
+_worker_reader = None
+
+def _init_worker(root_dir, share_quality):
+    global _worker_analyzer, _worker_quality, _worker_reader
+    _worker_analyzer = DocAnalyzer(root_dir)
+    if share_quality:
+        _worker_quality = CodeQualityAnalyzer(root_dir)
+    _worker_reader = ThreadPoolExecutor(max_workers=READ_AHEAD)
+
+def _read_for_worker(filepath):
+    """Read filepath, taking its quality cache key first when it is needed."""
+    key = None
+    if _worker_quality:
+        try:
+            key = cache_key(filepath)
+        except OSError:
+            pass
+    return key, _read_source(filepath)
+
+def _analyze_batch(filepaths):
+    """Analyze a batch of files, reading ahead while earlier ones are parsed.
+
+    Returns (result, quality) pairs, where quality is the (cache key, code
+    quality result) of a poorly documented file when quality is shared.
+    """
+    results = []
+    for filepath, (key, content) in zip(filepaths, _worker_reader.map(_read_for_worker, filepaths)):
+        if content is None:
+            results.append((None, None))
+            continue
+
+        result = _worker_analyzer.analyze_content(filepath, content)
+        quality = None
+        if key and result['category'] == 'poorly_documented':
+            quality = (key, _worker_quality.analyze_content(filepath, content))
+        results.append((result, quality))
+    return results
+
 if __name__ == '__main__':
     analyzer = DocAnalyzer('/home/user/geant4')
     print("Analyzing Geant4 source code documentation...")
     print("This may take a few minutes...")
     print()
 
-    analyzer.analyze_directory('source')
+    analyzer.analyze_directory('source', quality_cache=CACHE_FILE)
     report = analyzer.generate_report()
 
     # Save detailed results to JSON
-    with open('doc_analysis_results.json', 'w') as f:
-        json.dump(analyzer.stats, f, indent=2, default=str)
+    if orjson:
+        with open('doc_analysis_results.json', 'wb') as f:
+            f.write(orjson.dumps(analyzer.stats, default=str, option=orjson.OPT_INDENT_2))
+    else:
+        with open('doc_analysis_results.json', 'w') as f:
+            json.dump(analyzer.stats, f, indent=2, default=str)
 
     print("\nDetailed results saved to: doc_analysis_results.json")
@@ -9,6 +9,11 @@ import os
 from pathlib import Path
 from collections import defaultdict
 
+# Markdown links [text](url), both absolute (/...) and relative (../)
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+# External links, anchors only and mailto links are not checked
+_SKIP_RE = re.compile(r'^(https?://|#|mailto:)')
+
 def find_markdown_files(docs_dir):
     """Find all markdown files in the docs directory"""
     md_files = []
@@ -26,20 +31,9 @@ def extract_links(file_path, docs_dir):
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    # Find all markdown links [text](url)
-    # Match both absolute (/...) and relative (../) links
-    pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-    matches = re.findall(pattern, content)
-
-    for text, url in matches:
-        # Skip external links
-        if url.startswith('http://') or url.startswith('https://'):
-            continue
-        # Skip anchors only
-        if url.startswith('#'):
-            continue
-        # Skip mailto links
-        if url.startswith('mailto:'):
+    for text, url in _LINK_RE.findall(content):
+        # Skip external links, anchors only and mailto links
+        if _SKIP_RE.match(url):
             continue
 
         links.append((text, url))
@@ -73,9 +67,21 @@ def resolve_link(source_file, link_url, docs_dir):
 
     return target, anchor
 
-def check_file_exists(file_path):
-    """Check if a file exists"""
-    return os.path.exists(file_path) and os.path.isfile(file_path)
+def check_file_exists(file_path, dir_cache):
+    """Check if a file exists, listing each directory only once"""
+    dirname, name = os.path.split(file_path)
+    files = dir_cache.get(dirname)
+    if files is None:
+        try:
+            with os.scandir(dirname or '.') as entries:
+                files = {entry.name for entry in entries if entry.is_file()}
+        except (FileNotFoundError, NotADirectoryError):
+            files = set()
+        except OSError:
+            # Directory can't be listed, check this file on its own
+            return os.path.isfile(file_path)
+        dir_cache[dirname] = files
+    return name in files
 
 def main():
     docs_dir = '/home/user/geant4/docs'
@@ -89,6 +95,8 @@ def main():
 
     broken_links = []
     total_links = 0
+    # Names of the files in each directory checked so far
+    dir_cache = {}
 
     for md_file in md_files:
         links = extract_links(md_file, docs_dir)
@@ -97,7 +105,7 @@ def main():
             total_links += 1
             target_file, anchor = resolve_link(md_file, link_url, docs_dir)
 
-            if target_file and not check_file_exists(target_file):
+            if target_file and not check_file_exists(target_file, dir_cache):
                 rel_source = os.path.relpath(md_file, docs_dir)
                 broken_links.append({
                     'source': rel_source,
@@ -1,87 +1,177 @@
 #!/usr/bin/env python3
 """Show concrete examples from each documentation category."""
 
+import heapq
 import json
+import sys
+from collections import Counter
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Analyzed paths are shown relative to the Geant4 checkout
+PREFIX = '/home/user/geant4/'
+
+# Results files larger than this are streamed with ijson, when it is
+# installed, instead of being parsed into memory whole
+STREAM_THRESHOLD = 64 * 1024 * 1024
+
+CATEGORIES = ('well_documented', 'partially_documented', 'poorly_documented')
+TOTALS = ('total_files', 'total_classes', 'total_functions')
+
+# Report rows; the trailing newline becomes the blank line between rows
+# once the report lines are joined
+WELL_ROW = ("{i}. {p}\n"
+            "   Quality Score: {qs}\n"
+            "   Classes: {c} (documented: {dc})\n"
+            "   Functions: {fn} (documented: {df})\n"
+            "   Doc blocks: {db}, Params: {pc}, Returns: {rc}\n").format
+PARTIAL_ROW = ("{i}. {p}\n"
+               "   Quality Score: {qs}\n"
+               "   Classes: {c} (documented: {dc})\n"
+               "   Functions: {fn} (documented: {df})\n"
+               "   Doc blocks: {db}\n").format
+
+def stream_results(path, totals):
+    """Yield (category, record) pairs from the results file using ijson.
+
+    Only one record is built at a time; the top-level totals are stored
+    into the given dict as they are parsed.
+    """
+    item_prefixes = {f'files_by_category.{c}.item': c for c in CATEGORIES}
+    builder = None
+    item_prefix = None
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if event == 'end_map' and prefix == item_prefix:
+                    yield item_prefixes[prefix], builder.value
+                    builder = None
+            elif event == 'start_map' and prefix in item_prefixes:
+                item_prefix = prefix
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix in TOTALS:
+                totals[prefix] = value
+
+def select_examples(records, top_n=5):
+    """Pick the records the report shows from (category, record) pairs.
+
+    Works in a single pass keeping only the chosen records, so the input
+    can be streamed. Ties on quality score keep the earlier record first.
+    """
+    counts = Counter()
+    best = {'well_documented': [], 'partially_documented': []}
+    large_no_docs = []
+    minimal_docs = []
+    for i, (category, f) in enumerate(records):
+        counts[category] += 1
+        heap = best.get(category)
+        if heap is not None:
+            item = (f['quality_score'], -i, f)
+            if len(heap) < top_n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        elif category == 'poorly_documented':
+            # Large files with no docs, and files with some code but minimal docs
+            if not large_no_docs and f['classes'] + f['functions'] > 20 and f['doc_blocks'] == 0:
+                large_no_docs.append(f)
+            elif len(minimal_docs) < 3 and 0 < f['doc_blocks'] < 3:
+                minimal_docs.append(f)
+    top = {c: [f for _, _, f in sorted(heap, reverse=True)] for c, heap in best.items()}
+    return counts, top, large_no_docs, minimal_docs
+
 def show_examples():
-    with open('doc_analysis_results.json', 'r') as f:
-        data = json.load(f)
+    path = Path('doc_analysis_results.json')
+    if ijson is not None and path.stat().st_size > STREAM_THRESHOLD:
+        totals = {}
+        records = stream_results(path, totals)
+    else:
+        raw = path.read_bytes()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
+        totals = {key: data[key] for key in TOTALS}
+        fbc = data['files_by_category']
+        records = ((c, f) for c in CATEGORIES for f in fbc[c])
+
+    # Consumes the records, so streamed totals are complete afterwards
+    counts, top, large_no_docs, minimal_docs = select_examples(records)
+    n_well = counts['well_documented']
+    n_partial = counts['partially_documented']
+    n_poor = counts['poorly_documented']
+    total = totals['total_files']
+
+    # Collect the report and write it out in one go
+    out = []
+    append = out.append
 
-    print("=" * 80)
-    print("CONCRETE EXAMPLES FROM EACH CATEGORY")
-    print("=" * 80)
-    print()
+    append("=" * 80)
+    append("CONCRETE EXAMPLES FROM EACH CATEGORY")
+    append("=" * 80)
+    append('')
 
     # Well-documented examples
-    well_doc = sorted(data['files_by_category']['well_documented'],
-                     key=lambda x: x['quality_score'], reverse=True)[:5]
-
-    print("1. WELL-DOCUMENTED FILES (Top 5 by quality score)")
-    print("-" * 80)
-    for i, f in enumerate(well_doc, 1):
-        rel_path = Path(f['file']).relative_to('/home/user/geant4')
-        print(f"{i}. {rel_path}")
-        print(f"   Quality Score: {f['quality_score']}")
-        print(f"   Classes: {f['classes']} (documented: {f['documented_classes']})")
-        print(f"   Functions: {f['functions']} (documented: {f['documented_functions']})")
-        print(f"   Doc blocks: {f['doc_blocks']}, Params: {f['param_count']}, Returns: {f['return_count']}")
-        print()
+    append("1. WELL-DOCUMENTED FILES (Top 5 by quality score)")
+    append("-" * 80)
+    for i, f in enumerate(top['well_documented'], 1):
+        append(WELL_ROW(i=i, p=f['file'].removeprefix(PREFIX), qs=f['quality_score'],
+                        c=f['classes'], dc=f['documented_classes'],
+                        fn=f['functions'], df=f['documented_functions'],
+                        db=f['doc_blocks'], pc=f['param_count'], rc=f['return_count']))
 
     # Partially documented examples
-    partial_doc = sorted(data['files_by_category']['partially_documented'],
-                        key=lambda x: x['quality_score'], reverse=True)[:5]
-
-    print("2. PARTIALLY DOCUMENTED FILES (Top 5)")
-    print("-" * 80)
-    for i, f in enumerate(partial_doc, 1):
-        rel_path = Path(f['file']).relative_to('/home/user/geant4')
-        print(f"{i}. {rel_path}")
-        print(f"   Quality Score: {f['quality_score']}")
-        print(f"   Classes: {f['classes']} (documented: {f['documented_classes']})")
-        print(f"   Functions: {f['functions']} (documented: {f['documented_functions']})")
-        print(f"   Doc blocks: {f['doc_blocks']}")
-        print()
+    append("2. PARTIALLY DOCUMENTED FILES (Top 5)")
+    append("-" * 80)
+    for i, f in enumerate(top['partially_documented'], 1):
+        append(PARTIAL_ROW(i=i, p=f['file'].removeprefix(PREFIX), qs=f['quality_score'],
+                           c=f['classes'], dc=f['documented_classes'],
+                           fn=f['functions'], df=f['documented_functions'],
+                           db=f['doc_blocks']))
 
     # Poorly documented examples with different issues
-    poor_doc = data['files_by_category']['poorly_documented']
+    append("3. POORLY DOCUMENTED FILES (Examples by issue type)")
+    append("-" * 80)
 
-    # Find examples with different characteristics
-    print("3. POORLY DOCUMENTED FILES (Examples by issue type)")
-    print("-" * 80)
-
-    # Large files with no docs
-    large_no_docs = [f for f in poor_doc if f['classes'] + f['functions'] > 20 and f['doc_blocks'] == 0]
     if large_no_docs:
         f = large_no_docs[0]
-        rel_path = Path(f['file']).relative_to('/home/user/geant4')
-        print(f"Large file with zero documentation:")
-        print(f"  {rel_path}")
-        print(f"  Classes: {f['classes']}, Functions: {f['functions']}, Doc blocks: 0")
-        print()
-
-    # Files with some code but minimal docs
-    minimal_docs = [f for f in poor_doc if f['doc_blocks'] > 0 and f['doc_blocks'] < 3][:3]
+        rel_path = f['file'].removeprefix(PREFIX)
+        append(f"Large file with zero documentation:")
+        append(f"  {rel_path}")
+        append(f"  Classes: {f['classes']}, Functions: {f['functions']}, Doc blocks: 0")
+        append('')
+
     if minimal_docs:
-        print("Files with minimal documentation:")
+        append("Files with minimal documentation:")
         for f in minimal_docs:
-            rel_path = Path(f['file']).relative_to('/home/user/geant4')
-            print(f"  {rel_path}")
-            print(f"    Doc blocks: {f['doc_blocks']}, Classes: {f['classes']}, Functions: {f['functions']}")
-        print()
+            rel_path = f['file'].removeprefix(PREFIX)
+            append(f"  {rel_path}")
+            append(f"    Doc blocks: {f['doc_blocks']}, Classes: {f['classes']}, Functions: {f['functions']}")
+        append('')
 
-    print("=" * 80)
+    append("=" * 80)
 
     # Summary statistics
-    print("\nSUMMARY STATISTICS")
-    print("-" * 80)
-    print(f"Total files analyzed: {data['total_files']:,}")
-    print(f"Total classes: {data['total_classes']:,}")
-    print(f"Total functions: {data['total_functions']:,}")
-    print()
-    print(f"Well-documented files: {len(well_doc)} ({100*len(data['files_by_category']['well_documented'])/data['total_files']:.1f}%)")
-    print(f"Partially documented: {len(data['files_by_category']['partially_documented'])} ({100*len(data['files_by_category']['partially_documented'])/data['total_files']:.1f}%)")
-    print(f"Poorly documented: {len(data['files_by_category']['poorly_documented'])} ({100*len(data['files_by_category']['poorly_documented'])/data['total_files']:.1f}%)")
+    append("\nSUMMARY STATISTICS")
+    append("-" * 80)
+    append(f"Total files analyzed: {total:,}")
+    append(f"Total classes: {totals['total_classes']:,}")
+    append(f"Total functions: {totals['total_functions']:,}")
+    append('')
+    append(f"Well-documented files: {n_well} ({100*n_well/total:.1f}%)")
+    append(f"Partially documented: {n_partial} ({100*n_partial/total:.1f}%)")
+    append(f"Poorly documented: {n_poor} ({100*n_poor/total:.1f}%)")
+
+    sys.stdout.write('\n'.join(out))
+    sys.stdout.write('\n')
 
 if __name__ == '__main__':
     show_examples()